@@ -9,20 +9,47 @@ MODEL_ID = os.getenv("BEDROCK_MODEL_ID")
 
 bedrock = boto3.client("bedrock-runtime", region_name=AWS_REGION)
 
-def call_llm(prompt: str) -> str:
-    if not MODEL_ID:
-        raise ValueError("BEDROCK_MODEL_ID is not set. Put it in your .env file.")
-
-    body = {
+def _request_body(prompt: str) -> dict:
+    return {
         "anthropic_version": "bedrock-2023-05-31",
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": 400,
         "temperature": 0.2
     }
 
+def call_llm(prompt: str) -> str:
+    if not MODEL_ID:
+        raise ValueError("BEDROCK_MODEL_ID is not set. Put it in your .env file.")
+
     resp = bedrock.invoke_model(
         modelId=MODEL_ID,
-        body=json.dumps(body)
+        body=json.dumps(_request_body(prompt))
     )
     data = json.loads(resp["body"].read())
     return data["content"][0]["text"]
+
+def _iter_stream_deltas(body):
+    for event in body:
+        chunk = json.loads(event["chunk"]["bytes"])
+        if chunk.get("type") == "content_block_delta":
+            text = chunk.get("delta", {}).get("text")
+            if text:
+                yield text
+
+def call_llm_stream(prompt: str):
+    """Return an iterator of text deltas from Bedrock's streaming API.
+
+    Lets the caller stop reading (and paying for) output as soon as it has
+    what it needs, e.g. a complete JSON object. The API call is issued here
+    rather than lazily on first iteration, so callers can catch failures
+    (e.g. an account without the InvokeModelWithResponseStream permission)
+    and fall back to call_llm.
+    """
+    if not MODEL_ID:
+        raise ValueError("BEDROCK_MODEL_ID is not set. Put it in your .env file.")
+
+    resp = bedrock.invoke_model_with_response_stream(
+        modelId=MODEL_ID,
+        body=json.dumps(_request_body(prompt))
+    )
+    return _iter_stream_deltas(resp["body"])
@@ -1,4 +1,9 @@
+import base64
+import hashlib
+import math
 import os, json, re
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from pypdf import PdfReader
 import numpy as np
@@ -11,72 +16,182 @@ ROOT_DIR = BACKEND_DIR.parent                    # .../project-root
 
 DOCS_DIR = BACKEND_DIR / "docs"                  # .../backend/docs
 OUT_DIR = ROOT_DIR / "data" / "index"            # .../project-root/data/index
+CACHE_DIR = OUT_DIR / "cache"                    # per-PDF parse+embed cache
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # ---- simple chunking ----
 def clean_text(t: str) -> str:
-    t = t.replace("\x00", " ")
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+    # str.split() collapses all whitespace runs in C — same result as the
+    # old re.sub(r"\s+", " ", ...) without the regex engine.
+    return " ".join(t.replace("\x00", " ").split())
+
+_WORD_RE = re.compile(r"\S+")
+
 
 def chunk_text(text: str, chunk_size=900, overlap=150):
-    words = text.split()
+    # Record (start, end) character offsets of every word once, then emit
+    # each chunk as a single slice of the original string. Avoids
+    # re-materializing every 900-word window through a join.
+    starts = array("i")
+    ends = array("i")
+    for m in _WORD_RE.finditer(text):
+        starts.append(m.start())
+        ends.append(m.end())
+
+    n = len(starts)
     chunks = []
     i = 0
-    while i < len(words):
-        chunk = " ".join(words[i:i+chunk_size])
-        chunks.append(chunk)
+    while i < n:
+        last = min(i + chunk_size, n) - 1
+        chunks.append(text[starts[i]:ends[last]])
         i += max(1, chunk_size - overlap)
     return chunks
 
 # ---- TODO: replace this with Bedrock embeddings later ----
 # For hackathon MVP, you can start with a fake embedding to prove pipeline,
 # or plug in Bedrock Titan Embeddings when ready.
+def _stable_hash(t: str) -> int:
+    # Python's builtin hash() is salted per interpreter (PYTHONHASHSEED),
+    # so ingestion and the retriever would disagree across processes.
+    # blake2b is fast and stable everywhere.
+    return int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little")
+
+
 def embed_texts(texts):
     # placeholder deterministic vectors (NOT semantic)
     # Replace with real embeddings ASAP.
-    vecs = []
-    for t in texts:
-        h = abs(hash(t)) % (10**8)
-        rng = np.random.default_rng(h)
-        vecs.append(rng.normal(size=(384,)).astype("float32"))
-    return np.vstack(vecs)
+    seeds = np.fromiter(
+        (_stable_hash(t) for t in texts),
+        dtype=np.uint64,
+        count=len(texts),
+    )
+    # One preallocated (N, 384) buffer; each row is filled in place so we
+    # avoid N small allocations + the final vstack copy.
+    out = np.empty((len(texts), 384), dtype=np.float32)
+    for i, seed in enumerate(seeds):
+        rng = np.random.Generator(np.random.Philox(key=int(seed)))
+        rng.standard_normal(out=out[i], dtype=np.float32)
+    return out
+
+# Brute-force scan with 8-bit scalar quantization is fine for small
+# corpora; past this many chunks, switch to IVF+PQ so query time stops
+# scaling linearly with N.
+SQ_INDEX_MAX_CHUNKS = 10_000
+IVF_NPROBE = 16  # speed/recall dial: higher = better recall, slower
+
+
+def build_index(X):
+    n, dim = X.shape
+    if n < SQ_INDEX_MAX_CHUNKS:
+        # int8 storage is 4x smaller than flat fp32 and typically faster to
+        # scan because the whole index stays cache-resident; the .search
+        # API is unchanged.
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(X)
+        index.add(X)
+        return index
+
+    nlist = max(1, int(4 * math.sqrt(n)))
+    quantizer = faiss.IndexFlatIP(dim)
+    # M=48 subquantizers x 8 bits: ~8x smaller than flat fp32 at 384 dims.
+    index = faiss.IndexIVFPQ(quantizer, dim, nlist, 48, 8, faiss.METRIC_INNER_PRODUCT)
+    index.train(X)
+    index.add(X)
+    index.nprobe = IVF_NPROBE
+    return index
+
+
+def _extract_page_range(path: str, start: int, stop: int):
+    # Fresh reader per worker: pypdf readers share one seekable stream and
+    # are NOT thread-safe — concurrent reads corrupt extraction.
+    reader = PdfReader(path)
+    return [p.extract_text() or "" for p in reader.pages[start:stop]]
+
 
 def read_pdf(path: Path) -> str:
     reader = PdfReader(str(path))
-    pages = []
-    for p in reader.pages:
-        pages.append(p.extract_text() or "")
+    n_pages = len(reader.pages)
+    # pypdf spends much of its extraction time in zlib, which releases the
+    # GIL, so a small thread pool overlaps page ranges on multi-page
+    # documents. Each worker opens its own reader (see _extract_page_range).
+    if n_pages > 1:
+        workers = min(4, n_pages)
+        step = -(-n_pages // workers)  # ceil division
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            parts = ex.map(
+                lambda start: _extract_page_range(str(path), start, min(start + step, n_pages)),
+                range(0, n_pages, step),
+            )
+        pages = [text for part in parts for text in part]
+    else:
+        pages = [p.extract_text() or "" for p in reader.pages]
     return clean_text(" ".join(pages))
 
+def ingest_pdf(pdf: Path):
+    """Parse, chunk, and embed one PDF, cached by content hash.
+
+    Unchanged PDFs are served straight from data/index/cache/<sha256>.json,
+    skipping both the pypdf parse and the embedding pass on re-runs.
+    """
+    key = hashlib.sha256(pdf.read_bytes()).hexdigest()
+    # v2: entries written before the thread-safety fix in read_pdf may hold
+    # corrupted text, so they are ignored rather than reused.
+    cache_path = CACHE_DIR / f"{key}.v2.json"
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        vecs = np.frombuffer(base64.b64decode(cached["vecs"]), dtype=np.float32)
+        return cached["chunks"], vecs.reshape(-1, 384).copy()
+
+    text = read_pdf(pdf)
+    chunks = chunk_text(text)
+    records = [
+        {
+            "id": f"{pdf.name}::chunk_{idx}",
+            "source": pdf.name,
+            "chunk_index": idx,
+            "text": ch,
+        }
+        for idx, ch in enumerate(chunks)
+    ]
+    vecs = embed_texts(chunks) if chunks else np.zeros((0, 384), dtype=np.float32)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps({
+        "source": pdf.name,
+        "chunks": records,
+        "vecs": base64.b64encode(vecs.tobytes()).decode("ascii"),
+    }))
+    return records, vecs
+
+
 def main():
+    pdfs = sorted(DOCS_DIR.glob("*.pdf"))
+
+    # pypdf extraction + embedding are CPU-bound, so fan PDFs out
+    # one-per-worker and merge results serially. Keep the single-PDF
+    # case in-process.
+    if len(pdfs) > 1:
+        with ProcessPoolExecutor() as ex:
+            results = list(ex.map(ingest_pdf, pdfs))
+    else:
+        results = [ingest_pdf(p) for p in pdfs]
+
     records = []
-    all_chunks = []
-
-    for pdf in sorted(DOCS_DIR.glob("*.pdf")):
-        text = read_pdf(pdf)
-        chunks = chunk_text(text)
-
-        for idx, ch in enumerate(chunks):
-            rec = {
-                "id": f"{pdf.name}::chunk_{idx}",
-                "source": pdf.name,
-                "chunk_index": idx,
-                "text": ch,
-            }
-            records.append(rec)
-            all_chunks.append(ch)
-
-    print(f"Extracted {len(all_chunks)} chunks from {len(list(DOCS_DIR.glob('*.pdf')))} PDFs")
-
-    # embeddings
-    X = embed_texts(all_chunks)
+    vec_blocks = []
+    for recs, vecs in results:
+        records.extend(recs)
+        vec_blocks.append(vecs)
+
+    print(f"Extracted {len(records)} chunks from {len(pdfs)} PDFs")
+
+    # embeddings (per-PDF blocks, possibly from cache)
+    X = np.concatenate(vec_blocks) if vec_blocks else np.zeros((0, 384), dtype=np.float32)
     faiss.normalize_L2(X)
 
-    # FAISS index
-    dim = X.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(X)
+    # FAISS index (int8 scalar quantizer for small corpora, IVF+PQ when N grows)
+    index = build_index(X)
 
     faiss.write_index(index, str(OUT_DIR / "faiss.index"))
     (OUT_DIR / "chunks.json").write_text(json.dumps(records, indent=2))
@@ -1,26 +1,46 @@
+import hashlib
 import json
 from pathlib import Path
 import numpy as np
 import faiss
 
+try:
+    import orjson
+except ImportError:  # keep working without the optional speedup
+    orjson = None
+
 
 # ---- IMPORTANT ----
 # This embed function MUST match the one used during ingestion,
 # otherwise FAISS results will be nonsense.
+def _stable_hash(t: str) -> int:
+    # Python's builtin hash() is salted per interpreter (PYTHONHASHSEED),
+    # so ingestion and the retriever would disagree across processes.
+    # blake2b is fast and stable everywhere.
+    return int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little")
+
+
 def embed_texts(texts):
-    vecs = []
-    for t in texts:
-        h = abs(hash(t)) % (10**8)
-        rng = np.random.default_rng(h)
-        vecs.append(rng.normal(size=(384,)).astype("float32"))
-    return np.vstack(vecs)
+    seeds = np.fromiter(
+        (_stable_hash(t) for t in texts),
+        dtype=np.uint64,
+        count=len(texts),
+    )
+    # One preallocated (N, 384) buffer; each row is filled in place so we
+    # avoid N small allocations + the final vstack copy.
+    out = np.empty((len(texts), 384), dtype=np.float32)
+    for i, seed in enumerate(seeds):
+        rng = np.random.Generator(np.random.Philox(key=int(seed)))
+        rng.standard_normal(out=out[i], dtype=np.float32)
+    return out
 
 
 class DocRetriever:
     def __init__(self, index_dir: Path):
         self.index_dir = index_dir
         self.index = faiss.read_index(str(index_dir / "faiss.index"))
-        self.records = json.loads((index_dir / "chunks.json").read_text())
+        raw = (index_dir / "chunks.json").read_bytes()
+        self.records = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
     def search(self, query: str, k: int = 4):
         qvec = embed_texts([query]).astype("float32")
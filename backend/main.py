@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import mmap
+import pickle
 import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
+import numpy as np
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
@@ -13,7 +21,17 @@ from pypdf import PdfReader
 import logging
 import traceback
 
-from bedrock_client import call_llm
+from bedrock_client import call_llm, call_llm_stream
+
+try:
+    import orjson
+except ImportError:  # keep working without the optional speedup
+    orjson = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # keep working without the optional speedup
+    fitz = None
 
 app = FastAPI(title="Compliance Autofill Engine", version="0.2.0")
 app.add_middleware(
@@ -47,7 +65,7 @@ class AutofillRequest(BaseModel):
 
     # retrieval options
     use_policy_docs: bool = True
-    top_k_docs: int = 4
+    top_k_docs: int = 3
 
 
 class AutofillResponse(BaseModel):
@@ -88,20 +106,30 @@ def health_bedrock():
 # =========================
 
 _JSON_RE = re.compile(r"\{.*\}", flags=re.DOTALL)
+_CODE_FENCE_HEAD_RE = re.compile(r"^```[a-zA-Z0-9_-]*\n")
+_CODE_FENCE_TAIL_RE = re.compile(r"\n```$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
 
 
 def _strip_code_fences(s: str) -> str:
     s = (s or "").strip()
     # remove ```json ... ``` or ``` ... ``` fences
     if s.startswith("```"):
-        s = re.sub(r"^```[a-zA-Z0-9_-]*\n", "", s)
-        s = re.sub(r"\n```$", "", s)
+        s = _CODE_FENCE_HEAD_RE.sub("", s)
+        s = _CODE_FENCE_TAIL_RE.sub("", s)
     return s.strip()
 
 
 def _try_json_loads(s: str) -> Optional[Dict[str, Any]]:
     try:
-        obj = json.loads(s)
+        if orjson is not None:
+            try:
+                obj = orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # stdlib accepts a few things orjson rejects (NaN/Infinity)
+                obj = json.loads(s)
+        else:
+            obj = json.loads(s)
         if isinstance(obj, dict):
             return obj
         return None
@@ -121,7 +149,7 @@ def _json_repair_best_effort(s: str) -> str:
             t = m.group(0)
 
     # remove trailing commas before } or ]
-    t = re.sub(r",\s*([}\]])", r"\1", t)
+    t = _TRAILING_COMMA_RE.sub(r"\1", t)
 
     # normalize smart quotes (rare but happens)
     t = t.replace("“", '"').replace("”", '"').replace("’", "'")
@@ -165,8 +193,13 @@ def _extract_json(text: str) -> Dict[str, Any]:
 def _extract_json_largest_valid_prefix(text: str) -> Optional[Dict[str, Any]]:
     """Try to recover a valid JSON object from a truncated model output.
 
-    We scan for closing braces '}' from the end and attempt to parse the largest
-    prefix that forms a valid JSON object.
+    One forward pass tracks brace depth (aware of string literals and
+    escapes) and records every position where depth returns to zero. The
+    largest balanced span is parsed first; if junk between objects makes it
+    invalid (e.g. '{"a": 1} {"b": bad}'), earlier spans are tried in turn,
+    matching what the old one-json.loads-per-closing-brace reverse scan
+    salvaged. The common truncated-output case still costs one scan and
+    one parse.
     """
     raw = (text or "").strip()
     raw = _strip_code_fences(raw)
@@ -182,16 +215,37 @@ def _extract_json_largest_valid_prefix(text: str) -> Optional[Dict[str, Any]]:
     if obj is not None:
         return obj
 
-    # Try progressively shorter prefixes ending at a '}'
-    for i in range(len(raw) - 1, -1, -1):
-        if raw[i] != "}":
-            continue
-        candidate = raw[: i + 1]
-        candidate = _json_repair_best_effort(candidate)
+    first_open = raw.find("{")
+    if first_open < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    closes: List[int] = []
+    for i in range(first_open, len(raw)):
+        ch = raw[i]
+        if escape:
+            escape = False
+        elif in_string:
+            if ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                closes.append(i)
+
+    for close in reversed(closes):
+        candidate = _json_repair_best_effort(raw[first_open:close + 1])
         obj = _try_json_loads(candidate)
         if obj is not None:
             return obj
-
     return None
 
 
@@ -200,6 +254,8 @@ def _safe_str(x: Any) -> str:
         return ""
     if isinstance(x, str):
         return x
+    if orjson is not None:
+        return orjson.dumps(x).decode()
     return json.dumps(x, ensure_ascii=False)
 
 
@@ -207,6 +263,106 @@ def _safe_str(x: Any) -> str:
 # Additional Helper
 # =========================
 
+# Known-good raw LLM JSON keyed by prompt hash. Prompts are deterministic
+# functions of (notes, profile, form_type, retrieved chunks), so identical
+# resubmissions — common when a user tweaks one field and retries — can be
+# served without another Bedrock roundtrip.
+_LLM_RAW_CACHE: Dict[str, str] = {}
+_LLM_RAW_CACHE_MAX = 256
+
+
+def _llm_cache_put(key: str, raw: str) -> None:
+    if len(_LLM_RAW_CACHE) >= _LLM_RAW_CACHE_MAX:
+        # dicts iterate in insertion order, so this evicts the oldest entry
+        _LLM_RAW_CACHE.pop(next(iter(_LLM_RAW_CACHE)))
+    _LLM_RAW_CACHE[key] = raw
+
+
+def _call_llm_collect(prompt: str) -> str:
+    """Stream the model response, stopping once a top-level JSON object closes.
+
+    Saves output tokens and latency versus waiting for the full response;
+    falls back to the blocking call if streaming isn't available.
+    """
+    try:
+        stream = call_llm_stream(prompt)
+    except Exception:
+        return call_llm(prompt)
+
+    parts: List[str] = []
+    depth = 0
+    in_string = False
+    escape = False
+    seen_open = False
+    done = False
+    for piece in stream:
+        parts.append(piece)
+        for ch in piece:
+            if escape:
+                escape = False
+            elif in_string:
+                if ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+                seen_open = True
+            elif ch == "}":
+                depth -= 1
+                if seen_open and depth <= 0:
+                    done = True
+                    break
+        if done:
+            break
+    return "".join(parts)
+
+
+def _local_json_repair(s: str) -> Optional[Dict[str, Any]]:
+    """Try to finish a truncated JSON object locally.
+
+    Strips fences and trailing commas, closes a dangling string literal,
+    then appends the closers for any brackets still open. Handles the
+    common "output hit max_tokens" truncation without paying for another
+    Bedrock roundtrip; returns None if the result still doesn't parse.
+    """
+    t = _json_repair_best_effort(s)
+    if not t.startswith("{"):
+        return None
+
+    closers: List[str] = []
+    in_string = False
+    escape = False
+    for ch in t:
+        if escape:
+            escape = False
+        elif in_string:
+            if ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            closers.append("}")
+        elif ch == "[":
+            closers.append("]")
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+
+    if not closers and not in_string:
+        return None  # nothing was open; this isn't a truncation problem
+
+    if in_string:
+        t += '"'
+    candidate = t + "".join(reversed(closers))
+    candidate = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+    return _try_json_loads(candidate)
+
+
 def _looks_truncated_json(s: str) -> bool:
     """Heuristic: model started a JSON object but didn't finish it."""
     if not s:
@@ -230,57 +386,224 @@ def _looks_truncated_json(s: str) -> bool:
 REPO_ROOT = Path(__file__).resolve().parents[1]  # .../compliance-autofill-engine
 INDEX_DIR = REPO_ROOT / "data" / "index"
 CHUNKS_PATH = INDEX_DIR / "chunks.json"
+# Pickled pre-tokenized index (keyed by chunks.json mtime) so cold starts
+# and /docs/reload skip re-parsing and re-tokenizing an unchanged corpus.
+INDEX_CACHE_PATH = INDEX_DIR / "chunks.pkl"
+
+class _PolicyIndex(NamedTuple):
+    """Corpus plus inverted index, built once per (re)load.
+
+    chunk_ids/chunk_texts are the corpus in struct-of-arrays layout:
+    parallel lists indexed by chunk number — the retrieval loop only ever
+    needs an id and a text per hit. vocab maps token -> token id;
+    postings[token id] is an int32 array of chunk indices containing the
+    token, with posting_tfs holding the aligned term counts; idf and
+    doc_len carry the BM25 statistics.
+
+    Retrieval runs in the request threadpool while /docs/reload may rebuild
+    in another thread, so the whole index is swapped as ONE reference: a
+    request sees either the old corpus or the new one, never a mix.
+    """
+
+    chunk_ids: List[str]
+    chunk_texts: List[str]
+    vocab: Dict[str, int]
+    postings: List[np.ndarray]
+    posting_tfs: List[np.ndarray]
+    idf: np.ndarray
+    doc_len: np.ndarray
+    avg_doc_len: float
+
+
+_INDEX = _PolicyIndex(
+    [], [], {}, [], [],
+    np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32), 1.0,
+)
 
-_DOC_CHUNKS: List[Dict[str, Any]] = []
+# Standard BM25 constants (Okapi defaults).
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+
+
+def _build_token_index(records: List[Dict[str, Any]]) -> _PolicyIndex:
+    chunk_ids: List[str] = []
+    chunk_texts: List[str] = []
+    vocab: Dict[str, int] = {}
+    postings: List[List[int]] = []
+    posting_tfs: List[List[int]] = []
+    doc_len = np.zeros(len(records), dtype=np.float32)
+
+    for idx, rec in enumerate(records):
+        text = _safe_str(rec.get("text"))
+        chunk_ids.append(_safe_str(rec.get("id")))
+        chunk_texts.append(text)
+        tokens = _tokenize(text)
+        doc_len[idx] = len(tokens)
+        counts = Counter(tokens)
+        for tok, tf in counts.items():
+            tid = vocab.get(tok)
+            if tid is None:
+                tid = len(postings)
+                vocab[tok] = tid
+                postings.append([])
+                posting_tfs.append([])
+            postings[tid].append(idx)
+            posting_tfs[tid].append(tf)
+
+    n_docs = max(1, len(records))
+    df = np.asarray([len(p) for p in postings], dtype=np.float32)
+    avg_doc_len = float(doc_len.mean()) if len(doc_len) else 1.0
+    return _PolicyIndex(
+        chunk_ids=chunk_ids,
+        chunk_texts=chunk_texts,
+        vocab=vocab,
+        postings=[np.asarray(p, dtype=np.int32) for p in postings],
+        posting_tfs=[np.asarray(t, dtype=np.float32) for t in posting_tfs],
+        idf=np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0).astype(np.float32),
+        doc_len=doc_len,
+        avg_doc_len=avg_doc_len if avg_doc_len > 0 else 1.0,
+    )
+
+
+def _restore_index_cache(sig: int) -> Optional[_PolicyIndex]:
+    if not INDEX_CACHE_PATH.exists():
+        return None
+    try:
+        with open(INDEX_CACHE_PATH, "rb") as f:
+            cached_sig, state = pickle.load(f)
+    except Exception:
+        return None  # stale/corrupt cache; rebuild from JSON
+    if cached_sig != sig:
+        return None
+    return _PolicyIndex(*state)
+
+
+def _store_index_cache(sig: int, index: _PolicyIndex) -> None:
+    try:
+        with open(INDEX_CACHE_PATH, "wb") as f:
+            pickle.dump((sig, tuple(index)), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        pass  # cache is best-effort; next load just re-parses
 
 
 def _load_chunks() -> None:
-    global _DOC_CHUNKS
+    global _INDEX
     if not CHUNKS_PATH.exists():
-        _DOC_CHUNKS = []
+        _INDEX = _build_token_index([])
         return
-    _DOC_CHUNKS = json.loads(CHUNKS_PATH.read_text(encoding="utf-8"))
+
+    sig = CHUNKS_PATH.stat().st_mtime_ns
+    cached = _restore_index_cache(sig)
+    if cached is not None:
+        _INDEX = cached
+        return
+
+    if orjson is not None:
+        # Parse the raw bytes straight out of the page cache: no utf-8
+        # decode into a Python str and a much faster (SIMD) parser.
+        with open(CHUNKS_PATH, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                records = orjson.loads(memoryview(mm))
+    else:
+        records = json.loads(CHUNKS_PATH.read_text(encoding="utf-8"))
+    index = _build_token_index(records)
+    _INDEX = index
+    _store_index_cache(sig, index)
+
+
+class _TokenTable(dict):
+    """Translation table that maps every non-whitelisted char to a space."""
+
+    def __missing__(self, codepoint: int) -> str:
+        return " "
+
+
+_TOK_TRANS = _TokenTable(
+    {ord(c): c for c in "abcdefghijklmnopqrstuvwxyz0123456789 \t\n\r\x0b\x0c"}
+)
 
 
 def _tokenize(s: str) -> List[str]:
-    s = s.lower()
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    return [w for w in s.split() if len(w) >= 3]
+    # lower() + one C-level translate pass instead of a per-call regex sub.
+    return [w for w in s.lower().translate(_TOK_TRANS).split() if len(w) >= 3]
 
 
 def retrieve_policy_context(query: str, k: int = 4) -> List[Tuple[str, str]]:
     """Return [(chunk_id, chunk_text), ...] best matching chunks by token overlap."""
-    if not _DOC_CHUNKS:
+    # Single read of the global: a concurrent /docs/reload swaps the whole
+    # _PolicyIndex reference, so this request keeps a consistent snapshot.
+    ix = _INDEX
+    if not ix.chunk_ids:
         return []
 
     q_tokens = set(_tokenize(query))
     if not q_tokens:
         return []
 
-    scored: List[Tuple[int, Dict[str, Any]]] = []
-    for rec in _DOC_CHUNKS:
-        text = _safe_str(rec.get("text"))
-        t_tokens = set(_tokenize(text))
-        score = len(q_tokens.intersection(t_tokens))
-        if score > 0:
-            scored.append((score, rec))
+    # BM25 over the prebuilt inverted index: each query token contributes
+    # only to the chunks that actually contain it, weighted by term
+    # frequency, inverse document frequency, and chunk length.
+    scores = np.zeros(len(ix.chunk_ids), dtype=np.float32)
+    cand_parts: List[np.ndarray] = []
+    for tok in q_tokens:
+        tid = ix.vocab.get(tok)
+        if tid is None:
+            continue
+        idx = ix.postings[tid]
+        tf = ix.posting_tfs[tid]
+        denom = tf + _BM25_K1 * (1.0 - _BM25_B + _BM25_B * ix.doc_len[idx] / ix.avg_doc_len)
+        scores[idx] += ix.idf[tid] * tf * (_BM25_K1 + 1.0) / denom
+        cand_parts.append(idx)
 
-    scored.sort(key=lambda x: x[0], reverse=True)
+    if not cand_parts:
+        return []
+
+    # Select top-k among the chunks actually touched by a posting list;
+    # no need to partition the (mostly zero) full score array.
+    cand = np.unique(np.concatenate(cand_parts))
+    cand_scores = scores[cand]
+    k = max(1, min(k, 10))
+    if k < len(cand):
+        sel = np.argpartition(-cand_scores, k)[:k]
+    else:
+        sel = np.arange(len(cand))
+    sel = sel[np.argsort(-cand_scores[sel], kind="stable")]
 
     results: List[Tuple[str, str]] = []
-    for score, rec in scored[: max(1, min(k, 10))]:
-        chunk_id = _safe_str(rec.get("id"))
-        chunk_text = _safe_str(rec.get("text"))
-        results.append((chunk_id, chunk_text))
+    for i in cand[sel]:
+        results.append((ix.chunk_ids[int(i)], ix.chunk_texts[int(i)]))
 
     return results
 
 
+def _dedup_excerpts(
+    pairs: List[Tuple[str, str]], max_chars_each: int = 800
+) -> List[Tuple[str, str]]:
+    """Drop near-duplicate excerpts and cap each one's length.
+
+    Neighboring chunks from the same PDF overlap (chunking is overlapped on
+    purpose) and share boilerplate headers; an excerpt whose token set is
+    >70% contained in one already kept adds prompt tokens without adding
+    information.
+    """
+    kept: List[Tuple[str, str]] = []
+    kept_tokens: List[set] = []
+    for cid, text in pairs:
+        toks = set(_tokenize(text))
+        if toks and any(
+            len(toks & seen) / len(toks) > 0.7 for seen in kept_tokens
+        ):
+            continue
+        kept.append((cid, text[:max_chars_each]))
+        kept_tokens.append(toks)
+    return kept
+
+
 @app.post("/docs/reload")
 def reload_docs():
     """Reload chunks.json without restarting the server."""
     _load_chunks()
-    return {"status": "ok", "chunks_loaded": len(_DOC_CHUNKS), "chunks_path": str(CHUNKS_PATH)}
+    return {"status": "ok", "chunks_loaded": len(_INDEX.chunk_ids), "chunks_path": str(CHUNKS_PATH)}
 
 
 @app.post("/debug/parse_two_pdfs")
@@ -289,11 +612,10 @@ async def debug_parse_two_pdfs(
     notes_pdf: UploadFile = File(...),
 ):
     """Sanity-check endpoint: uploads TWO PDFs and returns extracted text previews."""
-    client_bytes = await client_pdf.read()
-    notes_bytes = await notes_pdf.read()
-
-    client_text = _extract_pdf_text_bytes(client_bytes)
-    notes_text = _extract_pdf_text_bytes(notes_bytes)
+    client_text, notes_text = await asyncio.gather(
+        asyncio.to_thread(_extract_pdf_text_spooled, client_pdf.file),
+        asyncio.to_thread(_extract_pdf_text_spooled, notes_pdf.file),
+    )
 
     return {
         "client_filename": client_pdf.filename,
@@ -319,11 +641,13 @@ async def autofill_two_pdfs(
     - autofilled_fields/explanations/etc for the review panel
     """
     try:
-        client_bytes = await client_pdf.read()
-        notes_bytes = await notes_pdf.read()
-
-        client_text = _extract_pdf_text_bytes(client_bytes)
-        notes_text = _extract_pdf_text_bytes(notes_bytes)
+        # Parse both PDFs concurrently in worker threads (the parsers release
+        # the GIL in their native code), reading straight from the spooled
+        # upload files so the PDFs are never copied into bytes first.
+        client_text, notes_text = await asyncio.gather(
+            asyncio.to_thread(_extract_pdf_text_spooled, client_pdf.file),
+            asyncio.to_thread(_extract_pdf_text_spooled, notes_pdf.file),
+        )
 
         # Parse form fields
         use_docs = str(use_policy_docs).lower() in {"1", "true", "yes", "y"}
@@ -345,7 +669,7 @@ async def autofill_two_pdfs(
             top_k_docs=k,
         )
 
-        data = autofill(req)
+        data = await autofill(req)
 
         fields = data.get("autofilled_fields") or {}
         risk_flags = data.get("risk_flags") or []
@@ -371,87 +695,72 @@ _load_chunks()
 # Autofill endpoint
 # =========================
 
+# Rough 4-chars-per-token budgets for each prompt section. Input tokens are
+# the dominant LLM cost and latency lever, so oversized uploads get truncated
+# rather than shipped wholesale.
+_PROMPT_NOTES_MAX_CHARS = 6000      # ~1.5k tokens
+_PROMPT_PROFILE_MAX_CHARS = 2000    # ~500 tokens
+_PROMPT_EXCERPTS_MAX_CHARS = 8000   # ~2k tokens
+
+
 @app.post("/autofill", response_model=AutofillResponse)
-def autofill(req: AutofillRequest):
+async def autofill(req: AutofillRequest):
     client_profile = req.client_profile or {}
-
-    # Build a retrieval query from the user input
-    retrieval_query = f"form_type={req.form_type} advisor_notes={req.advisor_notes} client_profile={json.dumps(client_profile)}"
+    # Serialized once; reused by both the retrieval query and the prompt
+    if orjson is not None:
+        profile_json = orjson.dumps(client_profile).decode()
+    else:
+        profile_json = json.dumps(client_profile, ensure_ascii=False)
+
+    # Build a retrieval query from the user input. Notes can be tens of KB
+    # of extracted PDF text, and the leading couple thousand characters
+    # carry plenty of signal for lexical matching — cap what gets tokenized.
+    retrieval_query = (
+        f"form_type={req.form_type} "
+        f"advisor_notes={req.advisor_notes[:2000]} "
+        f"client_profile={profile_json[:1000]}"
+    )
 
     retrieved = []
     if req.use_policy_docs:
-        safe_k = max(1, min(int(req.top_k_docs or 4), 5))
-        retrieved = retrieve_policy_context(retrieval_query, k=safe_k)
+        safe_k = max(1, min(int(req.top_k_docs or 3), 5))
+        # Retrieval is CPU-ish (tokenize + posting-list math); keep it off
+        # the event loop alongside the blocking LLM calls below.
+        retrieved = await asyncio.to_thread(retrieve_policy_context, retrieval_query, safe_k)
 
     retrieved_block = "\n\n".join(
-        [f"SOURCE_ID: {cid}\nEXCERPT: {ctxt}" for cid, ctxt in retrieved]
+        [f"SOURCE_ID: {cid}\nEXCERPT: {ctxt}" for cid, ctxt in _dedup_excerpts(retrieved)]
     )
 
+    # Keep each section within its token budget (~4 chars/token)
+    notes_in = req.advisor_notes[:_PROMPT_NOTES_MAX_CHARS]
+    profile_in = profile_json[:_PROMPT_PROFILE_MAX_CHARS]
+    excerpts_in = retrieved_block[:_PROMPT_EXCERPTS_MAX_CHARS]
+
     prompt = f"""
 You are a financial compliance assistant.
 
-Return ONLY valid JSON (no markdown, no extra text).
-- Never include trailing commas.
-- Never include comments.
-- Never wrap the JSON in triple backticks.
-- Keep outputs SHORT to avoid truncation:
-  - explanations: max 1 short sentence per field (<= 120 chars)
-  - risk_flags: max 5 items
-  - missing_fields: max 10 items
-  - citations: max 1 item per field
-Follow this exact JSON schema:
-
-{{
-  "form_type": "{req.form_type}",
-  "autofilled_fields": {{
-    "client_name": "",
-    "client_age": 0,
-    "time_horizon_years": 0,
-    "risk_tolerance": "",
-    "primary_goal": "",
-    "recommended_action_summary": "",
-    "risk_disclosure_summary": ""
-  }},
-  "citations": {{
-    "client_name": [],
-    "client_age": [],
-    "time_horizon_years": [],
-    "risk_tolerance": [],
-    "primary_goal": [],
-    "recommended_action_summary": [],
-    "risk_disclosure_summary": []
-  }},
-  "missing_fields": ["..."],
-  "risk_flags": ["..."],
-  "explanations": {{
-    "client_name": "",
-    "client_age": "",
-    "time_horizon_years": "",
-    "risk_tolerance": "",
-    "primary_goal": "",
-    "recommended_action_summary": "",
-    "risk_disclosure_summary": ""
-  }}
-}}
+Return ONLY one valid JSON object (no markdown, no backticks, no comments, no trailing commas).
+Top-level keys:
+- "form_type": "{req.form_type}"
+- "autofilled_fields": object with exactly these fields -> client_name:str, client_age:int, time_horizon_years:int, risk_tolerance:str, primary_goal:str, recommended_action_summary:str, risk_disclosure_summary:str
+- "citations": object mapping each field above to a JSON array (always an array, max 1 item)
+- "missing_fields": array of field names (max 10 items)
+- "risk_flags": array of potential compliance issues, e.g. risk tolerance vs recommendation mismatch (max 5 items)
+- "explanations": object mapping each field above to one short sentence (<= 120 chars)
 
 RULES:
-- Use advisor_notes + client_profile when available.
-- You MAY also use the POLICY EXCERPTS below (they come from public SEC/FINRA documents).
+- Use advisor_notes + client_profile when available; POLICY EXCERPTS are public SEC/FINRA text.
 - Be conservative: if information is missing, put the field name in missing_fields.
-- risk_flags should identify potential compliance issues (e.g. mismatch between risk tolerance and recommendation).
-- citations must be a list of strings for each field.
-  Allowed citation strings are only:
-  - "advisor_notes"
-  - "client_profile"
-  - any SOURCE_ID from POLICY EXCERPTS (exactly as shown)
-- If you did not use a source for a field, leave its citations list empty.
+- Allowed citation strings: "advisor_notes", "client_profile", or a SOURCE_ID exactly as shown.
+- If you did not use a source for a field, leave its citations array empty.
 
 INPUT:
-advisor_notes: {req.advisor_notes}
-client_profile: {json.dumps(client_profile, ensure_ascii=False)}
+advisor_notes: {notes_in}
+client_profile: {profile_in}
 
 POLICY EXCERPTS:
-{retrieved_block if retrieved_block else "(none)"}
+{excerpts_in if excerpts_in else "(none)"}
 """.strip()
 
     try:
@@ -471,13 +780,34 @@ POLICY EXCERPTS:
                 f"PREVIOUS_OUTPUT (for reference):\n{bad}\n"
             )
 
+        # Serve identical prompts from the cache of known-good raw outputs.
+        prompt_key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+        cached_raw = _LLM_RAW_CACHE.get(prompt_key)
+        if cached_raw is not None:
+            last_raw = cached_raw
+            data = _extract_json_largest_valid_prefix(cached_raw) or {}
+            if not data:
+                # Bad entry (shouldn't happen, but never serve it twice):
+                # drop it so the fresh output below can take its place.
+                _LLM_RAW_CACHE.pop(prompt_key, None)
+                cached_raw = None
+
         # Retry a few times because LLMs can intermittently output invalid/truncated JSON
         for attempt in range(3):
-            last_raw = call_llm(prompt)
+            if data:
+                break
+            last_raw = await asyncio.to_thread(_call_llm_collect, prompt)
 
-            # If it looks truncated, immediately ask for a full reprint
+            # If it looks truncated, try to finish it locally first; only
+            # pay for a reprint roundtrip when local repair fails
             if _looks_truncated_json(last_raw):
-                last_raw = call_llm(_reprint_prompt(last_raw))
+                repaired = _local_json_repair(last_raw)
+                if repaired is not None:
+                    data = repaired
+                    break
+                last_raw = await asyncio.to_thread(
+                    _call_llm_collect, _reprint_prompt(last_raw)
+                )
 
             # 1) Try normal robust extraction
             try:
@@ -492,8 +822,16 @@ POLICY EXCERPTS:
                 data = recovered
                 break
 
+            # 2b) Close dangling brackets locally before asking for a reprint
+            repaired = _local_json_repair(last_raw)
+            if repaired is not None:
+                data = repaired
+                break
+
             # 3) Ask the model to FIX/REPRINT its JSON (no new content)
-            last_raw = call_llm(_reprint_prompt(last_raw))
+            last_raw = await asyncio.to_thread(
+                _call_llm_collect, _reprint_prompt(last_raw)
+            )
 
             # Try again
             try:
@@ -507,6 +845,16 @@ POLICY EXCERPTS:
                 # continue to next attempt
                 continue
 
+        if (
+            data
+            and cached_raw is None
+            and _extract_json_largest_valid_prefix(last_raw) is not None
+        ):
+            # Cache only raw outputs the hit path can re-parse. When data
+            # came from _local_json_repair, last_raw itself is still
+            # truncated and would produce an empty hit forever.
+            _llm_cache_put(prompt_key, last_raw)
+
         if not data:
             # Last-ditch fallback to prevent frontend hard-failure when output truncates.
             data = _fallback_parse_llm_output(last_raw, req.form_type)
@@ -541,41 +889,138 @@ POLICY EXCERPTS:
 
 
 
+# PDF text cleanup in a single pass: the first alternative catches hyphenated
+# line breaks (mar-\nket -> market); everything else the old word-break /
+# newline / whitespace passes did reduces to "whitespace run -> one space".
+_RE_CLEAN_ALL = re.compile(r"(\w)-\s*\n\s*(\w)|\s+")
+
+
+def _clean_sub(m: re.Match) -> str:
+    g1 = m.group(1)
+    if g1 is not None:
+        return g1 + m.group(2)
+    return " "
+
+
 def _clean_pdf_text(t: str) -> str:
     if not t:
         return ""
     # Replace null bytes
     t = t.replace("\x00", " ")
+    return _RE_CLEAN_ALL.sub(_clean_sub, t).strip()
 
-    # Join hyphenated line breaks: mar-\nket -> market
-    t = re.sub(r"(\w)-\s*\n\s*(\w)", r"\1\2", t)
 
-    # If a newline splits words, turn it into a space
-    t = re.sub(r"(?<=\w)\s*\n\s*(?=\w)", " ", t)
+def _pdf_page_range_text(data: bytes, start: int, stop: int) -> List[str]:
+    # Fresh reader per worker: pypdf readers share one seekable stream and
+    # are NOT thread-safe — concurrent reads corrupt extraction.
+    reader = PdfReader(BytesIO(data))
+    return [page.extract_text() or "" for page in reader.pages[start:stop]]
+
+
+def _extract_pdf_text_stream(stream) -> str:
+    reader = PdfReader(stream)
+    n_pages = len(reader.pages)
+    # pypdf spends much of its extraction time in zlib, which releases the
+    # GIL, so a small thread pool overlaps page ranges on multi-page
+    # documents. Each worker gets its own reader over the same bytes.
+    if n_pages > 1:
+        stream.seek(0)
+        data = stream.read()
+        workers = min(4, n_pages)
+        step = -(-n_pages // workers)  # ceil division
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            parts = ex.map(
+                lambda start: _pdf_page_range_text(data, start, min(start + step, n_pages)),
+                range(0, n_pages, step),
+            )
+        pages = [text for part in parts for text in part]
+    else:
+        pages = [page.extract_text() or "" for page in reader.pages]
+    raw = "\n".join(pages)
+    return _clean_pdf_text(raw)
 
-    # Collapse remaining newlines to spaces
-    t = re.sub(r"\n+", " ", t)
 
-    # Collapse all other whitespace into single spaces
-    t = re.sub(r"\s+", " ", t)
-    return t.strip()
+# Extracted text per uploaded PDF, keyed by content hash. Users commonly
+# resubmit the same PDFs after tweaking form options, and extraction is a
+# pure function of the bytes. Accessed from the request threadpool.
+_PDF_TEXT_CACHE: Dict[str, str] = {}
+_PDF_TEXT_CACHE_MAX = 64
+_PDF_TEXT_CACHE_LOCK = threading.Lock()
+
+
+def _pdf_cache_get(key: str) -> Optional[str]:
+    with _PDF_TEXT_CACHE_LOCK:
+        return _PDF_TEXT_CACHE.get(key)
+
+
+def _pdf_cache_put(key: str, text: str) -> None:
+    with _PDF_TEXT_CACHE_LOCK:
+        if len(_PDF_TEXT_CACHE) >= _PDF_TEXT_CACHE_MAX:
+            # dicts iterate in insertion order, so this evicts the oldest
+            _PDF_TEXT_CACHE.pop(next(iter(_PDF_TEXT_CACHE)))
+        _PDF_TEXT_CACHE[key] = text
+
+
+def _fitz_extract(data: bytes) -> str:
+    # PyMuPDF's C extractor is roughly an order of magnitude faster
+    # than pypdf on the same documents.
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        raw = "\n".join(page.get_text("text") for page in doc)
+    finally:
+        doc.close()
+    return _clean_pdf_text(raw)
 
 
 def _extract_pdf_text_bytes(data: bytes) -> str:
     if not data:
         return ""
-    reader = PdfReader(BytesIO(data))
-    pages = []
-    for page in reader.pages:
-        pages.append(page.extract_text() or "")
-    raw = "\n".join(pages)
-    return _clean_pdf_text(raw)
+
+    key = hashlib.sha256(data).hexdigest()
+    cached = _pdf_cache_get(key)
+    if cached is not None:
+        return cached
+
+    if fitz is not None:
+        text = _fitz_extract(data)
+    else:
+        text = _extract_pdf_text_stream(BytesIO(data))
+
+    _pdf_cache_put(key, text)
+    return text
+
+
+def _extract_pdf_text_spooled(fileobj) -> str:
+    """Extract text from an upload's spooled temp file.
+
+    The content hash for the cache is computed by streaming the file in
+    blocks. Single-page PDFs are parsed straight from the stream; the
+    PyMuPDF path and multi-page pypdf extraction (one reader per worker)
+    read the file fully, since both need their own view of the bytes.
+    """
+    h = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(1 << 20), b""):
+        h.update(block)
+    key = h.hexdigest()
+    cached = _pdf_cache_get(key)
+    if cached is not None:
+        return cached
+
+    fileobj.seek(0)
+    if fitz is not None:
+        text = _fitz_extract(fileobj.read())
+    else:
+        text = _extract_pdf_text_stream(fileobj)
+
+    _pdf_cache_put(key, text)
+    return text
 
 
 def _extract_pdf_text(upload: UploadFile) -> str:
-    # For sync endpoints that already read from the file handle
-    data = upload.file.read()
-    return _extract_pdf_text_bytes(data)
+    # UploadFile.file is already a SpooledTemporaryFile; the spooled path
+    # handles content hashing, the text cache, and the fitz-vs-pypdf choice.
+    return _extract_pdf_text_spooled(upload.file)
 
 def _build_document_text(form_type: str, fields: Dict[str, Any], risk_flags: List[str]) -> str:
     """Create a single editable text document for the frontend big box."""
@@ -638,22 +1083,22 @@ def _build_document_text(form_type: str, fields: Dict[str, Any], risk_flags: Lis
     return "\n".join(lines)
 
 @app.post("/autofill-from-pdf", response_model=AutofillResponse)
-def autofill_from_pdf(
+async def autofill_from_pdf(
     file: UploadFile = File(...),
     form_type: str = Form(...),
     client_profile: Optional[str] = Form(None),
     advisor_notes: Optional[str] = Form(None),
     use_policy_docs: bool = Form(True),
-    top_k_docs: int = Form(4),
+    top_k_docs: int = Form(3),
 ):
     if file.content_type not in {"application/pdf"} and not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported.")
 
     try:
-        pdf_text = _extract_pdf_text(file)
+        pdf_text = await asyncio.to_thread(_extract_pdf_text, file)
         profile: Optional[Dict[str, Any]] = None
         if client_profile:
-            profile = json.loads(client_profile)
+            profile = orjson.loads(client_profile) if orjson is not None else json.loads(client_profile)
 
         combined_notes = "\n\n".join([s for s in [advisor_notes, pdf_text] if s])
         if not combined_notes:
@@ -666,23 +1111,66 @@ def autofill_from_pdf(
             use_policy_docs=use_policy_docs,
             top_k_docs=top_k_docs,
         )
-        return autofill(req)
+        return await autofill(req)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF autofill failed: {e}")
 
+_TRAILING_COMMA_ARR_RE = re.compile(r",\s*(\])")
+
+
+def _slice_json_value(text: str, key: str, open_ch: str, close_ch: str) -> Optional[str]:
+    """Return the balanced {...} or [...] value following "key": via one scan.
+
+    Walks forward tracking bracket depth while skipping string literals and
+    escapes, so nested structures are handled correctly (the old non-greedy
+    regexes stopped at the first closer and backtracked on DOTALL input).
+    """
+    pos = text.find(f'"{key}"')
+    if pos < 0:
+        return None
+    i = text.find(":", pos + len(key) + 2)
+    if i < 0:
+        return None
+    i += 1
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    if i >= len(text) or text[i] != open_ch:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for j in range(i, len(text)):
+        ch = text[j]
+        if escape:
+            escape = False
+        elif in_string:
+            if ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == open_ch:
+            depth += 1
+        elif ch == close_ch:
+            depth -= 1
+            if depth == 0:
+                return text[i:j + 1]
+    return None
+
+
 def _extract_first_json_array(text: str, key: str) -> Optional[List[Any]]:
     """Best-effort extraction of a JSON array value for a given key from raw text."""
     if not text or not key:
         return None
-    # Look for: "key": [ ... ]
-    m = re.search(rf'"{re.escape(key)}"\s*:\s*(\[.*?\])', text, flags=re.DOTALL)
-    if not m:
+    arr_raw = _slice_json_value(text, key, "[", "]")
+    if arr_raw is None:
         return None
-    arr_raw = m.group(1)
     # light repair (remove trailing commas)
-    arr_raw = re.sub(r",\s*(\])", r"\1", arr_raw)
+    arr_raw = _TRAILING_COMMA_ARR_RE.sub(r"\1", arr_raw)
     try:
         val = json.loads(arr_raw)
         return val if isinstance(val, list) else None
@@ -694,11 +1182,10 @@ def _extract_first_json_object(text: str, key: str) -> Optional[Dict[str, Any]]:
     """Best-effort extraction of a JSON object value for a given key from raw text."""
     if not text or not key:
         return None
-    m = re.search(rf'"{re.escape(key)}"\s*:\s*(\{{.*?\}})\s*(,\s*"|\s*\}}\s*$)', text, flags=re.DOTALL)
-    if not m:
+    obj_raw = _slice_json_value(text, key, "{", "}")
+    if obj_raw is None:
         return None
-    obj_raw = m.group(1)
-    obj_raw = re.sub(r",\s*([}\]])", r"\1", obj_raw)
+    obj_raw = _TRAILING_COMMA_RE.sub(r"\1", obj_raw)
     obj_raw = obj_raw.replace("“", '"').replace("”", '"').replace("’", "'")
     try:
         val = json.loads(obj_raw)